@@ -1,20 +1,74 @@
 """
 通风报信插件 - 帮你传话给好友，支持来回对话
 """
+import os
 import re
 import json
+import time
+import heapq
+import uuid
+import sqlite3
 import asyncio
-from typing import Dict, Optional, Tuple
+import threading
+from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 from astrbot.api.event import filter, AstrMessageEvent
-from astrbot.api.star import Context, Star, register
+from astrbot.api.star import Context, Star, StarTools, register
 from astrbot.api.message_components import Plain, At, Reply, Image
 from astrbot.api import logger, AstrBotConfig
 
 # 消息记录存储，用于追踪回复链（限制最大条数防止内存泄漏）
 MAX_RECORDS = 500
 message_records: Dict[str, dict] = {}
-# 用户最近收到的传话记录
-user_last_received: Dict[str, dict] = {}
+
+# 会话索引：每个用户保留最近收到的几段传话，超过用户数上限时淘汰最久未使用的用户
+MAX_THREADS_PER_USER = 5
+MAX_INDEXED_USERS = 1000
+
+class ConversationIndex:
+    """会话索引：用户 -> 最近收到的传话（环形缓冲，最新在前，同一对方只保留最新一条）"""
+    
+    def __init__(self, max_users: int, max_threads: int):
+        self.max_users = max_users
+        self.max_threads = max_threads
+        self._index: "OrderedDict[str, deque]" = OrderedDict()
+    
+    def record(self, user_id: str, thread: dict):
+        """记录用户收到的一段传话，thread 需包含 from_user"""
+        threads = self._index.get(user_id)
+        if threads is None:
+            threads = self._index[user_id] = deque(maxlen=self.max_threads)
+        else:
+            self._index.move_to_end(user_id)
+            for i, existing in enumerate(threads):
+                if existing['from_user'] == thread['from_user']:
+                    del threads[i]
+                    break
+        threads.appendleft(thread)
+        while len(self._index) > self.max_users:
+            self._index.popitem(last=False)
+    
+    def threads(self, user_id: str) -> List[dict]:
+        """用户最近的传话，最新在前"""
+        threads = self._index.get(user_id)
+        if not threads:
+            return []
+        self._index.move_to_end(user_id)
+        return list(threads)
+    
+    def get(self, user_id: str, n: int = 1) -> Optional[dict]:
+        """获取用户最近的第 n 段传话"""
+        threads = self._index.get(user_id)
+        if not threads or not 1 <= n <= len(threads):
+            return None
+        self._index.move_to_end(user_id)
+        return threads[n - 1]
+    
+    def clear(self):
+        self._index.clear()
+
+conversation_index = ConversationIndex(MAX_INDEXED_USERS, MAX_THREADS_PER_USER)
 
 def _trim_records():
     """当记录超过上限时清理最早的记录"""
@@ -23,6 +77,426 @@ def _trim_records():
         for k in keys[:len(keys) - MAX_RECORDS]:
             del message_records[k]
 
+# 已处理的入站事件，键为 (bot self_id, 消息 message_id)，用于过滤重连/重试导致的重复投递
+MAX_SEEN_EVENTS = 2000
+SEEN_EVENT_TTL = 600
+seen_events: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+# 已拦截的重复事件计数
+duplicate_stats = {"suppressed": 0}
+
+def _mark_event_seen(key: Tuple[str, str]) -> bool:
+    """记录事件，返回 True 表示首次出现，False 表示重复投递"""
+    now = time.monotonic()
+    # 按插入顺序即时间顺序，从最早的记录开始清理过期项
+    while seen_events:
+        _, seen_at = next(iter(seen_events.items()))
+        if now - seen_at <= SEEN_EVENT_TTL:
+            break
+        seen_events.popitem(last=False)
+    if key in seen_events:
+        duplicate_stats["suppressed"] += 1
+        return False
+    seen_events[key] = now
+    while len(seen_events) > MAX_SEEN_EVENTS:
+        seen_events.popitem(last=False)
+    return True
+
+# 定时任务时间格式：相对时间（30m、1h30m、2小时、1天）、HH:MM、[YYYY-]MM-DD HH:MM
+SCHEDULE_TIME_PATTERN = r'(?:(?:\d{4}-)?\d{1,2}-\d{1,2}[\sT_]+\d{1,2}[:：]\d{2}|\d{1,2}[:：]\d{2}|(?:\d+(?:秒|分钟|分|小时|天|[smhd]))+)'
+# 定时任务最长可预约时间
+MAX_SCHEDULE_AHEAD = timedelta(days=365)
+# 非管理员可同时挂起的定时任务数
+MAX_PENDING_PER_USER = 20
+
+# 保留的群发记录条数（用于群发撤回）
+MAX_BROADCAST_HISTORY = 20
+
+def _write_json_atomic(path: str, data):
+    """写入临时文件后替换，避免写入中断导致文件损坏"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+# 内置群发分组：仅好友 / 仅群聊
+BUILTIN_SEGMENTS = {'好友': 'friends', '群聊': 'groups'}
+
+_RELATIVE_UNITS = {'s': 1, '秒': 1, 'm': 60, '分': 60, '分钟': 60, 'h': 3600, '小时': 3600, 'd': 86400, '天': 86400}
+
+def _parse_schedule_time(token: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """解析定时任务时间，返回触发时间；格式不正确时返回 None"""
+    now = now or datetime.now()
+    token = token.strip().replace('：', ':')
+    
+    # 相对时间，可组合如 1h30m
+    if re.fullmatch(r'(?:\d+(?:秒|分钟|分|小时|天|[smhd]))+', token):
+        seconds = sum(int(num) * _RELATIVE_UNITS[unit] for num, unit in re.findall(r'(\d+)(秒|分钟|分|小时|天|[smhd])', token))
+        try:
+            return now + timedelta(seconds=seconds) if seconds > 0 else None
+        except OverflowError:
+            return None
+    
+    # 当天 HH:MM，已过则顺延到明天
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', token)
+    if match:
+        try:
+            target = now.replace(hour=int(match.group(1)), minute=int(match.group(2)), second=0, microsecond=0)
+        except ValueError:
+            return None
+        return target if target > now else target + timedelta(days=1)
+    
+    # [YYYY-]MM-DD HH:MM
+    match = re.fullmatch(r'(?:(\d{4})-)?(\d{1,2})-(\d{1,2})[\sT_]+(\d{1,2}):(\d{2})', token)
+    if match:
+        year = int(match.group(1)) if match.group(1) else now.year
+        try:
+            target = datetime(year, int(match.group(2)), int(match.group(3)), int(match.group(4)), int(match.group(5)))
+            if not match.group(1) and target <= now:
+                target = target.replace(year=year + 1)
+        except ValueError:
+            return None
+        return target
+    
+    return None
+
+class TellScheduler:
+    """
+    定时任务调度器
+    所有待发送任务共用一个按触发时间排序的最小堆和一个计时循环；任务持久化到 SQLite，
+    每次增删只写一行，数据库操作放到线程中执行，不阻塞事件循环
+    """
+    
+    # 同时执行的到期任务数，避免大量任务同时到期时瞬间发出所有消息
+    MAX_CONCURRENT_FIRES = 10
+    
+    def __init__(self, path: str, on_fire: Callable):
+        self.path = path
+        self.on_fire = on_fire
+        self.tasks: Dict[str, dict] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._creator_counts: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._firing = set()
+        self._fire_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_FIRES)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tasks (id TEXT PRIMARY KEY, fire_at REAL NOT NULL, data TEXT NOT NULL)")
+        self._db.commit()
+        self._load()
+    
+    def _load(self):
+        """从数据库恢复未触发的任务（仅插件加载时执行一次）"""
+        try:
+            for (data,) in self._db.execute("SELECT data FROM tasks"):
+                self._track(json.loads(data))
+            heapq.heapify(self._heap)
+            if self.tasks:
+                logger.info(f"[Messenger] 已恢复 {len(self.tasks)} 个定时任务")
+        except Exception as e:
+            logger.error(f"[Messenger] 读取定时任务失败: {e}")
+    
+    def _track(self, task: dict):
+        self.tasks[task['id']] = task
+        self._heap.append((task['fire_at'], task['id']))
+        self._creator_counts[task['creator']] = self._creator_counts.get(task['creator'], 0) + 1
+    
+    def _untrack(self, task_id: str) -> Optional[dict]:
+        task = self.tasks.pop(task_id, None)
+        if task is not None:
+            self._creator_counts[task['creator']] -= 1
+            if not self._creator_counts[task['creator']]:
+                del self._creator_counts[task['creator']]
+        return task
+    
+    def _db_write(self, sql: str, rows: List[tuple]):
+        with self._db_lock:
+            self._db.executemany(sql, rows)
+            self._db.commit()
+    
+    async def _db_write_async(self, sql: str, rows: List[tuple]):
+        try:
+            await asyncio.to_thread(self._db_write, sql, rows)
+        except Exception as e:
+            logger.error(f"[Messenger] 保存定时任务失败: {e}")
+    
+    def start(self):
+        """启动计时循环（需在事件循环中调用，重复调用无副作用）"""
+        if self._loop_task and not self._loop_task.done():
+            return
+        try:
+            self._loop_task = asyncio.get_running_loop().create_task(self._run())
+        except RuntimeError:
+            pass
+    
+    async def stop(self):
+        """停止计时循环，未触发的任务保留在数据库中"""
+        if self._loop_task and not self._loop_task.done():
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+        self._loop_task = None
+        # 正在执行的任务（如耗时的定时群发）一并取消，卸载后不再继续发送
+        firing = list(self._firing)
+        for fire_task in firing:
+            fire_task.cancel()
+        if firing:
+            await asyncio.gather(*firing, return_exceptions=True)
+        with self._db_lock:
+            self._db.close()
+    
+    async def add(self, task: dict) -> dict:
+        """添加任务，task 需包含 fire_at（时间戳）和 creator"""
+        task['id'] = uuid.uuid4().hex[:6]
+        while task['id'] in self.tasks:
+            task['id'] = uuid.uuid4().hex[:6]
+        # 先落盘再加入堆，保证触发时删除的行一定已写入
+        await self._db_write_async("INSERT INTO tasks (id, fire_at, data) VALUES (?, ?, ?)",
+                                   [(task['id'], task['fire_at'], json.dumps(task, ensure_ascii=False))])
+        self._track(task)
+        heapq.heappush(self._heap, (task['fire_at'], task['id']))
+        # 新任务成为最早的任务时唤醒循环重新计时
+        if self._heap[0][1] == task['id']:
+            self._wakeup.set()
+        self.start()
+        return task
+    
+    async def cancel(self, task_id: str) -> Optional[dict]:
+        """取消任务，堆中的条目在出堆时惰性丢弃"""
+        task = self._untrack(task_id)
+        if task is None:
+            return None
+        # 已取消的条目过多时重建堆
+        if len(self._heap) > 2 * len(self.tasks) + 64:
+            self._heap = [(t['fire_at'], t['id']) for t in self.tasks.values()]
+            heapq.heapify(self._heap)
+        await self._db_write_async("DELETE FROM tasks WHERE id = ?", [(task_id,)])
+        return task
+    
+    def list_tasks(self, creator: str = None) -> List[dict]:
+        """按触发时间列出任务，可按创建者过滤"""
+        tasks = [t for t in self.tasks.values() if creator is None or t['creator'] == creator]
+        return sorted(tasks, key=lambda t: t['fire_at'])
+    
+    def count_by_creator(self, creator: str) -> int:
+        return self._creator_counts.get(creator, 0)
+    
+    async def _run(self):
+        """计时循环：等待到最早任务的触发时间，期间有更早的任务加入时提前唤醒"""
+        while True:
+            while self._heap and self._heap[0][1] not in self.tasks:
+                heapq.heappop(self._heap)
+            
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            # 一次取出所有到期任务
+            now = time.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                _, task_id = heapq.heappop(self._heap)
+                task = self._untrack(task_id)
+                if task is not None:
+                    due.append(task)
+            if not due:
+                continue
+            
+            # 先批量落盘再发送，重启后不会重复触发；发送放到独立协程，耗时的群发不阻塞其他任务
+            await self._db_write_async("DELETE FROM tasks WHERE id = ?", [(task['id'],) for task in due])
+            for task in due:
+                fire_task = asyncio.create_task(self._fire(task))
+                self._firing.add(fire_task)
+                fire_task.add_done_callback(self._firing.discard)
+    
+    async def _fire(self, task: dict):
+        async with self._fire_semaphore:
+            try:
+                await self.on_fire(task)
+            except Exception as e:
+                logger.error(f"[Messenger] 定时任务 #{task['id']} 执行失败: {e}")
+
+class BroadcastLog:
+    """
+    群发记录
+    每次群发在发送前创建记录，sent 为 [目标, 消息ID, 是否群聊(0/1)] 列表，发送过程中逐条追加并定期写入 JSON 文件，
+    群发途中也可以撤回
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        # 正在发送的群发 -> 发送结束事件
+        self._active: Dict[str, asyncio.Event] = {}
+        # 已要求停止后续发送的群发
+        self._stopped: Set[str] = set()
+        # 串行化写入，避免并发保存争用同一个临时文件、旧快照覆盖新快照
+        self._save_lock = asyncio.Lock()
+        self._load()
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for entry in json.load(f):
+                    self.entries[entry['id']] = entry
+        except Exception as e:
+            logger.error(f"[Messenger] 读取群发记录失败: {e}")
+    
+    async def save(self):
+        """在事件循环中复制快照，文件写入放到线程中执行；拿到锁后才取快照，保证最后写入的总是最新数据"""
+        async with self._save_lock:
+            snapshot = [dict(entry, sent=list(entry['sent'])) for entry in self.entries.values()]
+            try:
+                await asyncio.to_thread(_write_json_atomic, self.path, snapshot)
+            except Exception as e:
+                logger.error(f"[Messenger] 保存群发记录失败: {e}")
+    
+    def create(self, sender_id: str) -> str:
+        """发送前创建群发记录并标记为发送中，超过上限时丢弃最早的已结束记录，返回群发 ID"""
+        broadcast_id = uuid.uuid4().hex[:6]
+        while broadcast_id in self.entries:
+            broadcast_id = uuid.uuid4().hex[:6]
+        self.entries[broadcast_id] = {
+            "id": broadcast_id,
+            "sender": sender_id,
+            "created_at": int(time.time()),
+            "sent": []
+        }
+        self._active[broadcast_id] = asyncio.Event()
+        for old_id in [k for k in self.entries if k not in self._active][:max(0, len(self.entries) - MAX_BROADCAST_HISTORY)]:
+            del self.entries[old_id]
+        return broadcast_id
+    
+    def record(self, broadcast_id: str, item: list):
+        entry = self.entries.get(broadcast_id)
+        if entry is not None:
+            entry['sent'].append(item)
+    
+    def finish(self, broadcast_id: str):
+        """标记群发结束，没有发出任何消息的记录直接删除"""
+        done = self._active.pop(broadcast_id, None)
+        if done:
+            done.set()
+        self._stopped.discard(broadcast_id)
+        entry = self.entries.get(broadcast_id)
+        if entry is not None and not entry['sent']:
+            del self.entries[broadcast_id]
+    
+    def is_active(self, broadcast_id: str) -> bool:
+        return broadcast_id in self._active
+    
+    def is_stopped(self, broadcast_id: str) -> bool:
+        return broadcast_id in self._stopped
+    
+    async def stop(self, broadcast_id: str, timeout: float = 30):
+        """要求正在进行的群发停止后续发送，并等待当前这条发送结束"""
+        done = self._active.get(broadcast_id)
+        if done is None:
+            return
+        self._stopped.add(broadcast_id)
+        try:
+            await asyncio.wait_for(done.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[Messenger] 等待群发 #{broadcast_id} 停止超时")
+    
+    def get(self, broadcast_id: str) -> Optional[dict]:
+        return self.entries.get(broadcast_id)
+    
+    async def remove_recalled(self, broadcast_id: str, recalled_ids: Set[str]):
+        """移除已撤回的消息，全部撤回后删除记录"""
+        entry = self.entries.get(broadcast_id)
+        if entry is None:
+            return
+        entry['sent'] = [item for item in entry['sent'] if item[1] not in recalled_ids]
+        if not entry['sent'] and not self.is_active(broadcast_id):
+            del self.entries[broadcast_id]
+        await self.save()
+
+class AudienceSegments:
+    """
+    群发分组
+    分组名 -> {"users": QQ号集合, "groups": 群号集合}。QQ号和群号可能重复，因此按类型分开保存，
+    群发时各自只与好友列表/群列表做集合运算；成员集合常驻内存，持久化到 JSON 文件
+    """
+    
+    MEMBER_TYPES = ('users', 'groups')
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.members: Dict[str, Dict[str, Set[str]]] = {}
+        self._load()
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.members = {
+                    name: {kind: set(typed.get(kind, [])) for kind in self.MEMBER_TYPES}
+                    for name, typed in json.load(f).items()
+                }
+        except Exception as e:
+            logger.error(f"[Messenger] 读取群发分组失败: {e}")
+    
+    def _save(self):
+        try:
+            _write_json_atomic(self.path, {
+                name: {kind: sorted(ids) for kind, ids in typed.items()}
+                for name, typed in self.members.items()
+            })
+        except Exception as e:
+            logger.error(f"[Messenger] 保存群发分组失败: {e}")
+    
+    def exists(self, name: str) -> bool:
+        return name in BUILTIN_SEGMENTS or name in self.members
+    
+    def get(self, name: str) -> Optional[Dict[str, Set[str]]]:
+        return self.members.get(name)
+    
+    def size(self, name: str) -> int:
+        typed = self.members.get(name)
+        return sum(len(ids) for ids in typed.values()) if typed else 0
+    
+    def add_members(self, name: str, users: Iterable[str], groups: Iterable[str]) -> int:
+        """向分组添加好友和群（分组不存在时创建），返回新增数量"""
+        typed = self.members.setdefault(name, {kind: set() for kind in self.MEMBER_TYPES})
+        before = self.size(name)
+        typed['users'].update(users)
+        typed['groups'].update(groups)
+        self._save()
+        return self.size(name) - before
+    
+    def remove_members(self, name: str, users: Iterable[str], groups: Iterable[str]) -> int:
+        """从分组移除好友和群，分组为空时删除，返回移除数量"""
+        typed = self.members.get(name)
+        if typed is None:
+            return 0
+        before = self.size(name)
+        typed['users'].difference_update(users)
+        typed['groups'].difference_update(groups)
+        removed = before - self.size(name)
+        if not self.size(name):
+            del self.members[name]
+        self._save()
+        return removed
+    
+    def delete(self, name: str) -> bool:
+        if self.members.pop(name, None) is None:
+            return False
+        self._save()
+        return True
+
 @register("messenger", "落日七号", "通风报信插件 - 帮你传话给好友，支持来回对话", "1.3.1", "")
 class MessengerPlugin(Star):
     def __init__(self, context: Context, config: AstrBotConfig = None):
@@ -45,10 +519,29 @@ class MessengerPlugin(Star):
         blacklist_str = broadcast_settings.get('blacklist', '')
         self.broadcast_blacklist = set(qq.strip() for qq in blacklist_str.split(',') if qq.strip())
         self.broadcast_delay = broadcast_settings.get('delay_seconds', 1)
+        self.recall_concurrency = max(1, int(broadcast_settings.get('recall_concurrency', 5)))
         
         # 管理员列表
         admin_str = self.config.get('admin_qq_list', '')
         self.admin_qq_list = set(qq.strip() for qq in admin_str.split(',') if qq.strip())
+        
+        # 缓存的 QQ 平台客户端，供无事件上下文的定时任务使用
+        self._client = None
+        # bot self_id -> 客户端，多个 QQ 账号时定时任务按创建时的账号发送
+        self._clients: Dict[str, object] = {}
+        
+        # 插件数据目录（由 AstrBot 分配，保存定时任务、群发记录等）
+        self.data_dir = str(StarTools.get_data_dir("astrbot_plugin_messenger"))
+        
+        # 定时任务调度器
+        self.scheduler = TellScheduler(os.path.join(self.data_dir, 'scheduled_tasks.db'), self._fire_scheduled)
+        self.scheduler.start()
+        
+        # 群发记录，用于群发撤回
+        self.broadcast_log = BroadcastLog(os.path.join(self.data_dir, 'broadcasts.json'))
+        
+        # 群发分组
+        self.segments = AudienceSegments(os.path.join(self.data_dir, 'segments.json'))
     
     # ==================== 帮助命令 ====================
     
@@ -65,9 +558,26 @@ class MessengerPlugin(Star):
 • `传话 QQ号 消息内容` - 用QQ号传话
 • `通告群聊 群号 消息内容` - 向群发通告（管理员）
 • `群发 消息内容` - 一键群发（管理员）
+• `群发 @分组名 消息内容` - 只群发给指定分组（管理员）
+• `群发撤回 群发ID` - 撤回一次群发的所有消息（管理员）
+• `分组添加 分组名 QQ号/群号...` - 添加群发分组成员，可用 u:QQ号、g:群号 标明类型（管理员）
+• `分组移除 分组名 QQ号/群号...` - 移除群发分组成员（管理员）
+• `分组删除 分组名` / `分组查看 分组名` / `分组列表` - 管理群发分组（管理员）
+• `定时传话 时间 @某人 消息内容` - 定时传话
+• `定时通告群聊 时间 群号 消息内容` - 定时通告（管理员）
+• `定时群发 时间 消息内容` - 定时群发（管理员）
+• `定时列表` - 查看待发送的定时任务
+• `取消定时 任务ID` - 取消定时任务
+
+**【时间格式】**
+`30m`、`1h30m`、`2小时`、`20:30`、`10-20 08:00`
 
 **【回复传话】**
 引用传话消息，直接发送回复内容即可
+也可以不引用，在私聊或收件箱群中直接发送：
+• `回复 消息内容` - 回复最近收到的一段传话
+• `回复 序号 消息内容` - 回复最近第 N 段传话
+• `回复列表` - 查看最近收到的传话及序号
 
 **【注意事项】**
 • 传话目标必须是 bot 的好友
@@ -126,6 +636,18 @@ class MessengerPlugin(Star):
             logger.error(f"获取群信息失败: {e}")
         return str(group_id)
     
+    def _is_duplicate_event(self, event: AstrMessageEvent) -> bool:
+        """检查事件是否为重复投递（同一 bot 的同一条消息只处理一次）"""
+        message_id = getattr(event.message_obj, 'message_id', None)
+        if not message_id:
+            return False
+        key = (self._get_bot_id(event) or "", str(message_id))
+        if _mark_event_seen(key):
+            return False
+        logger.warning(f"[Messenger] 忽略重复投递的消息: self_id={key[0]}, message_id={key[1]}，"
+                       f"累计已拦截 {duplicate_stats['suppressed']} 条")
+        return True
+    
     def _is_inbox_group(self, group_id) -> bool:
         """判断是否是收件箱群聊"""
         return bool(self.enable_inbox and self.inbox_type == 'group' and self.inbox_id and str(group_id) == str(self.inbox_id))
@@ -180,12 +702,18 @@ class MessengerPlugin(Star):
                 
                 # 跳过命令头
                 if skip_command and not command_skipped:
-                    cmd_match = re.match(r'^/?(?:传话|转发|转告|群发|broadcast|一键群发|通告群聊|群聊通告)\s*', text, re.IGNORECASE)
+                    cmd_match = re.match(r'^/?(?:(定时)?(?:传话|转发|转告|群发|broadcast|一键群发|通告群聊|群聊通告)|(回复)(?:\s+[1-9](?=\s|$))?)\s*', text, re.IGNORECASE)
+                    quick_reply = bool(cmd_match and cmd_match.group(2))
                     if cmd_match:
                         text = text[cmd_match.end():]
                         command_skipped = True
-                    # 跳过 @ 或 QQ号/群号
-                    at_match = re.match(r'(?:\[At:\d+\]|@[^\s]*(?:\(\d+\))?|\d{5,11})\s*', text)
+                        # 定时命令还需跳过时间
+                        if cmd_match.group(1):
+                            time_match = re.match(rf'{SCHEDULE_TIME_PATTERN}\s*', text)
+                            if time_match:
+                                text = text[time_match.end():]
+                    # 跳过 @ 或 QQ号/群号（快捷回复没有目标，不跳过）
+                    at_match = None if quick_reply else re.match(r'(?:\[At:\d+\]|@[^\s]*(?:\(\d+\))?|\d{5,11})\s*', text)
                     if at_match:
                         text = text[at_match.end():]
                     elif at_found:
@@ -228,6 +756,7 @@ class MessengerPlugin(Star):
             r'\[At:(\d{5,11})\]',
             r'@[^\(]+\((\d{5,11})\)',
             r'@(\d{5,11})',
+            rf'定时(?:传话|转发|转告)\s*{SCHEDULE_TIME_PATTERN}\s*(\d{{5,11}})',
             r'(?:传话|转发|转告)\s*(\d{5,11})',
         ]
         for pattern in patterns:
@@ -239,8 +768,8 @@ class MessengerPlugin(Star):
     
     def _extract_target_group(self, message_str: str) -> Optional[str]:
         """从消息中提取目标群号"""
-        # 匹配 "通告群聊 群号" 格式
-        match = re.search(r'(?:通告群聊|群聊通告)\s*(\d{5,11})', message_str, re.IGNORECASE)
+        # 匹配 "通告群聊 群号" 和 "定时通告群聊 时间 群号" 格式
+        match = re.search(rf'(?:通告群聊|群聊通告)\s*(?:{SCHEDULE_TIME_PATTERN}\s*)?(\d{{5,11}})', message_str, re.IGNORECASE)
         if match:
             return match.group(1)
         return None
@@ -285,6 +814,17 @@ class MessengerPlugin(Star):
         
         return None
     
+    def _parse_quick_reply(self, message: str) -> Optional[int]:
+        """检查是否是快捷回复命令（回复 内容 / 回复 序号 内容），返回会话序号"""
+        match = re.match(r'^\s*/?回复(?:\s+([1-9])(?=\s|$))?(?:\s|$)', message)
+        if not match:
+            return None
+        return int(match.group(1)) if match.group(1) else 1
+    
+    def _is_quick_reply_list_command(self, message: str) -> bool:
+        """检查是否是查看最近传话命令"""
+        return bool(re.match(r'^\s*/?回复列表\s*$', message))
+    
     def _is_tell_command(self, message: str) -> bool:
         """检查是否是传话命令"""
         return bool(re.search(r'(?:^|[\s/])(?:传话|转发|转告)(?:\s|@|\d|$)', message, re.IGNORECASE))
@@ -302,47 +842,126 @@ class MessengerPlugin(Star):
                     message += (text or "")
                 else:
                     message += " "
-        return bool(re.search(r'(?:^|[\s/])(?:群发|broadcast|一键群发)', message, re.IGNORECASE))
+        return bool(re.search(r'(?:^|[\s/])(?:群发(?!撤回)|broadcast|一键群发)', message, re.IGNORECASE))
+    
+    def _extract_broadcast_segment(self, message: str) -> Optional[str]:
+        """从群发命令（含定时群发）中提取 @分组名"""
+        match = re.search(rf'(?:^|[\s/])(?:定时)?(?:群发|broadcast|一键群发)\s*(?:{SCHEDULE_TIME_PATTERN}\s*)?@([^\s@(]+)(?=\s|$)', message, re.IGNORECASE)
+        return match.group(1) if match else None
+    
+    def _parse_segment_command(self, message: str) -> Optional[Tuple[str, str]]:
+        """检查是否是分组管理命令，返回 (操作, 参数)"""
+        match = re.match(r'^\s*/?分组(添加|移除|删除|查看|列表)\s*(.*)$', message, re.DOTALL)
+        return (match.group(1), match.group(2).strip()) if match else None
+    
+    def _extract_recall_id(self, message: str) -> Optional[str]:
+        """检查是否是群发撤回命令，返回群发 ID"""
+        match = re.match(r'^\s*/?群发撤回\s*#?([0-9a-f]{6})\s*$', message)
+        return match.group(1) if match else None
     
     def _is_group_announce_command(self, message: str) -> bool:
         """检查是否是通告群聊命令"""
         return bool(re.search(r'(?:^|[\s/])(?:通告群聊|群聊通告)(?:\s|\d|$)', message, re.IGNORECASE))
     
-    async def _send_private_message(self, event: AstrMessageEvent, qq: str, message: str, reply_to_msg_id: str = None) -> Optional[str]:
-        """发送私聊消息"""
+    def _get_schedule_kind(self, message: str) -> Optional[str]:
+        """检查是否是定时命令，返回任务类型 tell/announce/broadcast"""
+        match = re.search(r'(?:^|[\s/])定时(传话|转发|转告|通告群聊|群聊通告|群发|一键群发)', message)
+        if not match:
+            return None
+        if match.group(1) in ('传话', '转发', '转告'):
+            return 'tell'
+        if match.group(1) in ('通告群聊', '群聊通告'):
+            return 'announce'
+        return 'broadcast'
+    
+    def _is_schedule_list_command(self, message: str) -> bool:
+        """检查是否是查看定时任务命令"""
+        return bool(re.match(r'^\s*/?(?:定时列表|定时任务)\s*$', message))
+    
+    def _extract_schedule_cancel_id(self, message: str) -> Optional[str]:
+        """检查是否是取消定时命令，返回任务 ID"""
+        match = re.match(r'^\s*/?取消定时\s*#?([0-9a-f]{6})\s*$', message)
+        return match.group(1) if match else None
+    
+    def _get_client(self, event: Optional[AstrMessageEvent] = None):
+        """获取 QQ 平台客户端，无事件时（如定时任务触发）使用缓存的客户端或从平台实例获取"""
+        if event is not None:
+            if event.get_platform_name() != "aiocqhttp":
+                return None
+            from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import AiocqhttpMessageEvent
+            if not isinstance(event, AiocqhttpMessageEvent):
+                return None
+            self._client = event.bot
+            bot_id = self._get_bot_id(event)
+            if bot_id:
+                self._clients[bot_id] = event.bot
+            return event.bot
+        
+        if self._client is None:
+            try:
+                platform = self.context.get_platform(filter.PlatformAdapterType.AIOCQHTTP)
+                if platform:
+                    self._client = platform.get_client()
+            except Exception as e:
+                logger.error(f"获取 QQ 平台客户端失败: {e}")
+        return self._client
+    
+    async def _resolve_client(self, self_id: Optional[str]):
+        """按 bot self_id 获取客户端（定时任务触发时使用），未记录 self_id 时退回默认客户端"""
+        if not self_id:
+            return self._get_client()
+        client = self._clients.get(self_id)
+        if client:
+            return client
         try:
-            if event.get_platform_name() == "aiocqhttp":
-                from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import AiocqhttpMessageEvent
-                if isinstance(event, AiocqhttpMessageEvent):
-                    if reply_to_msg_id:
-                        message = f"[CQ:reply,id={reply_to_msg_id}]{message}"
-                    result = await event.bot.api.call_action('send_private_msg', user_id=int(qq), message=message)
-                    return str(result.get('message_id', ''))
+            for platform in self.context.platform_manager.get_insts():
+                if platform.meta().name != "aiocqhttp":
+                    continue
+                candidate = platform.get_client()
+                info = await candidate.api.call_action('get_login_info')
+                if str(info.get('user_id', '')) == str(self_id):
+                    self._clients[self_id] = candidate
+                    return candidate
+        except Exception as e:
+            logger.error(f"获取 bot {self_id} 的客户端失败: {e}")
+        return None
+    
+    async def _send_private_message(self, event: Optional[AstrMessageEvent], qq: str, message: str, reply_to_msg_id: str = None,
+                                    client=None) -> Optional[str]:
+        """发送私聊消息（未传入 client 时从事件获取，event 也为 None 时使用缓存的平台客户端）"""
+        try:
+            client = client or self._get_client(event)
+            if client:
+                if reply_to_msg_id:
+                    message = f"[CQ:reply,id={reply_to_msg_id}]{message}"
+                result = await client.api.call_action('send_private_msg', user_id=int(qq), message=message)
+                return str(result.get('message_id', ''))
         except Exception as e:
             logger.error(f"发送私聊消息失败: {e}")
         return None
     
-    async def _send_group_message(self, event: AstrMessageEvent, group_id: str, message: str, reply_to_msg_id: str = None) -> Optional[str]:
-        """发送群聊消息"""
+    async def _send_group_message(self, event: Optional[AstrMessageEvent], group_id: str, message: str, reply_to_msg_id: str = None,
+                                  client=None) -> Optional[str]:
+        """发送群聊消息（未传入 client 时从事件获取，event 也为 None 时使用缓存的平台客户端）"""
         try:
-            if event.get_platform_name() == "aiocqhttp":
-                from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import AiocqhttpMessageEvent
-                if isinstance(event, AiocqhttpMessageEvent):
-                    if reply_to_msg_id:
-                        message = f"[CQ:reply,id={reply_to_msg_id}]{message}"
-                    result = await event.bot.api.call_action('send_group_msg', group_id=int(group_id), message=message)
-                    return str(result.get('message_id', ''))
+            client = client or self._get_client(event)
+            if client:
+                if reply_to_msg_id:
+                    message = f"[CQ:reply,id={reply_to_msg_id}]{message}"
+                result = await client.api.call_action('send_group_msg', group_id=int(group_id), message=message)
+                return str(result.get('message_id', ''))
         except Exception as e:
             logger.error(f"发送群聊消息失败: {e}")
         return None
     
-    async def _send_to_user(self, event: AstrMessageEvent, target_qq: str, message: str, reply_to_msg_id: str = None) -> Optional[str]:
+    async def _send_to_user(self, event: Optional[AstrMessageEvent], target_qq: str, message: str, reply_to_msg_id: str = None,
+                            client=None) -> Optional[str]:
         """发送消息给用户（支持收件箱转发）"""
         if self.enable_inbox and self.inbox_id and self.owner_qq and str(target_qq) == str(self.owner_qq):
             if self.inbox_type == 'group':
-                return await self._send_group_message(event, self.inbox_id, message, reply_to_msg_id)
-            return await self._send_private_message(event, self.inbox_id, message, reply_to_msg_id)
-        return await self._send_private_message(event, target_qq, message, reply_to_msg_id)
+                return await self._send_group_message(event, self.inbox_id, message, reply_to_msg_id, client=client)
+            return await self._send_private_message(event, self.inbox_id, message, reply_to_msg_id, client=client)
+        return await self._send_private_message(event, target_qq, message, reply_to_msg_id, client=client)
     
     async def _llm_parse_tell_intent(self, message: str) -> Optional[Tuple[str, str]]:
         """使用 LLM 智能识别传话意图"""
@@ -404,11 +1023,14 @@ class MessengerPlugin(Star):
     
     @filter.event_message_type(filter.EventMessageType.ALL)
     async def on_message(self, event: AstrMessageEvent):
-        """统一消息处理器，按优先级处理：引用回复 > 通告群聊 > 传话命令 > 群发命令"""
+        """统一消息处理器，按优先级处理：引用回复 > 快捷回复 > 定时任务 > 通告群聊 > 群发命令 > 传话命令"""
         message_str = event.message_str
         sender_id = str(event.get_sender_id())
         sender_name = event.get_sender_name()
         
+        # 插件加载时可能尚无事件循环，确保已恢复的定时任务能按时触发
+        self.scheduler.start()
+        
         logger.info(f"[Messenger] on_message: message_str='{(message_str or '')[:80]}', "
                     f"components={[type(c).__name__ for c in event.message_obj.message]}")
         
@@ -446,65 +1068,219 @@ class MessengerPlugin(Star):
                 if not content:
                     return
                 
-                group_id = event.message_obj.group_id
-                group_name = None if not group_id or self._is_inbox_group(group_id) else await self._get_group_name(event, str(group_id))
-                
-                logger.info(f"[Messenger] 回复: {sender_name} -> {target_name}: {content[:50]}...")
-                
-                sender_info = self._format_sender_info(sender_name, sender_id, group_name)
-                reply_msg = f"{self.msg_prefix} {sender_info} 让我回复你：\n{content}"
+                if self._is_duplicate_event(event):
+                    event.stop_event()
+                    return
                 
-                # 回复始终发送到私聊（通过 _send_to_user 支持收件箱）
-                new_msg_id = await self._send_to_user(event, target_qq, reply_msg)
-                if new_msg_id:
-                    message_records[new_msg_id] = {
-                        "from_user": sender_id,
-                        "to_user": target_qq,
-                        "from_name": sender_name,
-                        "to_name": target_name,
-                        "original_msg_id": new_msg_id
-                    }
-                    _trim_records()
-                    user_last_received[target_qq] = {
-                        "from_user": sender_id,
-                        "from_name": sender_name,
-                        "msg_id": new_msg_id
-                    }
-                    yield event.plain_result(f"{self.success_prefix} 已将你的回复转达给 {target_name}！")
-                else:
-                    yield event.plain_result(f"{self.error_prefix} 消息发送失败。")
+                async for result in self._relay_reply(event, target_qq, target_name, content):
+                    yield result
+                event.stop_event()
+                return
+        
+        # ========== 优先级2：快捷回复（无需引用，仅限私聊或收件箱群） ==========
+        # 传话只会送到私聊或收件箱，在其他群里说"回复 ..."不应被转发
+        current_group_id = event.message_obj.group_id
+        quick_reply_allowed = not current_group_id or self._is_inbox_group(current_group_id)
+        if quick_reply_allowed and self._is_quick_reply_list_command(message_str):
+            async for result in self._do_quick_reply_list(event):
+                yield result
+            event.stop_event()
+            return
+        
+        quick_reply_index = self._parse_quick_reply(message_str)
+        if quick_reply_allowed and quick_reply_index and conversation_index.threads(sender_id):
+            if self._is_duplicate_event(event):
+                event.stop_event()
+                return
+            async for result in self._do_quick_reply(event, quick_reply_index):
+                yield result
+            event.stop_event()
+            return
+        
+        # ========== 优先级3：定时任务命令 ==========
+        schedule_kind = self._get_schedule_kind(message_str)
+        if schedule_kind:
+            if schedule_kind != 'tell' and not self._is_admin(sender_id):
+                yield event.plain_result(f"{self.error_prefix} 定时通告群聊和定时群发仅管理员可用。请在插件配置中添加你的QQ号到管理员列表。")
                 event.stop_event()
                 return
+            if self._is_duplicate_event(event):
+                event.stop_event()
+                return
+            async for result in self._do_schedule(event, schedule_kind):
+                yield result
+            event.stop_event()
+            return
         
-        # ========== 优先级2：通告群聊命令（仅管理员） ==========
+        if self._is_schedule_list_command(message_str):
+            async for result in self._do_schedule_list(event):
+                yield result
+            event.stop_event()
+            return
+        
+        cancel_id = self._extract_schedule_cancel_id(message_str)
+        if cancel_id:
+            if self._is_duplicate_event(event):
+                event.stop_event()
+                return
+            async for result in self._do_schedule_cancel(event, cancel_id):
+                yield result
+            event.stop_event()
+            return
+        
+        # ========== 优先级4：通告群聊命令（仅管理员） ==========
         if self._is_group_announce_command(message_str):
             if not self._is_admin(sender_id):
                 yield event.plain_result(f"{self.error_prefix} 通告群聊功能仅管理员可用。请在插件配置中添加你的QQ号到管理员列表。")
                 event.stop_event()
                 return
+            if self._is_duplicate_event(event):
+                event.stop_event()
+                return
             async for result in self._do_group_announce(event):
                 yield result
             event.stop_event()
             return
         
-        # ========== 优先级3：群发命令（仅管理员） ==========
+        # ========== 优先级5：群发撤回 / 群发分组 / 群发命令（仅管理员） ==========
+        segment_command = self._parse_segment_command(message_str)
+        if segment_command:
+            if not self._is_admin(sender_id):
+                yield event.plain_result(f"{self.error_prefix} 群发分组管理仅管理员可用。请在插件配置中添加你的QQ号到管理员列表。")
+                event.stop_event()
+                return
+            async for result in self._do_segment_command(event, *segment_command):
+                yield result
+            event.stop_event()
+            return
+        
+        recall_id = self._extract_recall_id(message_str)
+        if recall_id:
+            if not self._is_admin(sender_id):
+                yield event.plain_result(f"{self.error_prefix} 群发撤回功能仅管理员可用。请在插件配置中添加你的QQ号到管理员列表。")
+                event.stop_event()
+                return
+            if self._is_duplicate_event(event):
+                event.stop_event()
+                return
+            async for result in self._do_broadcast_recall(event, recall_id):
+                yield result
+            event.stop_event()
+            return
+        
         if self._is_broadcast_command(event):
             if not self._is_admin(sender_id):
                 yield event.plain_result(f"{self.error_prefix} 群发功能仅管理员可用。请在插件配置中添加你的QQ号到管理员列表。")
                 event.stop_event()
                 return
+            if self._is_duplicate_event(event):
+                event.stop_event()
+                return
             async for result in self._do_broadcast(event):
                 yield result
             event.stop_event()
             return
         
-        # ========== 优先级4：传话命令 ==========
+        # ========== 优先级6：传话命令 ==========
         if self._is_tell_command(message_str):
+            if self._is_duplicate_event(event):
+                event.stop_event()
+                return
             async for result in self._do_tell(event):
                 yield result
             event.stop_event()
             return
     
+    # ==================== 回复链记录 ====================
+    
+    def _is_via_inbox(self, target_qq: str) -> bool:
+        """发给该用户的消息是否会转到收件箱"""
+        return bool(self.enable_inbox and self.inbox_id and self.owner_qq and str(target_qq) == str(self.owner_qq))
+    
+    def _record_tell(self, msg_id: str, sender_id: str, sender_name: str, target_qq: str, target_name: str, via_inbox: bool):
+        """记录传话消息，用于追踪回复链和快捷回复"""
+        message_records[msg_id] = {
+            "from_user": sender_id,
+            "to_user": target_qq,
+            "from_name": sender_name,
+            "to_name": target_name,
+            "original_msg_id": msg_id,
+            "via_inbox": via_inbox
+        }
+        _trim_records()
+        conversation_index.record(target_qq, {
+            "from_user": sender_id,
+            "from_name": sender_name,
+            "msg_id": msg_id,
+            "via_inbox": via_inbox,
+            "time": int(time.time())
+        })
+    
+    def _record_announce(self, msg_id: str, sender_id: str, sender_name: str, target_group: str, group_name: str):
+        """记录群聊通告，群成员引用回复时转发给发件人"""
+        message_records[msg_id] = {
+            "from_user": sender_id,
+            "to_user": sender_id,
+            "from_name": sender_name,
+            "to_name": sender_name,
+            "original_msg_id": msg_id,
+            "is_group_announce": True,
+            "target_group": target_group,
+            "target_group_name": group_name
+        }
+        _trim_records()
+    
+    # ==================== 回复 ====================
+    
+    async def _relay_reply(self, event: AstrMessageEvent, target_qq: str, target_name: str, content: str):
+        """将回复转达给对方（始终发送到私聊，通过 _send_to_user 支持收件箱）"""
+        sender_id = str(event.get_sender_id())
+        sender_name = event.get_sender_name()
+        group_id = event.message_obj.group_id
+        group_name = None if not group_id or self._is_inbox_group(group_id) else await self._get_group_name(event, str(group_id))
+        
+        logger.info(f"[Messenger] 回复: {sender_name} -> {target_name}: {content[:50]}...")
+        
+        sender_info = self._format_sender_info(sender_name, sender_id, group_name)
+        reply_msg = f"{self.msg_prefix} {sender_info} 让我回复你：\n{content}"
+        
+        new_msg_id = await self._send_to_user(event, target_qq, reply_msg)
+        if new_msg_id:
+            self._record_tell(new_msg_id, sender_id, sender_name, target_qq, target_name, self._is_via_inbox(target_qq))
+            yield event.plain_result(f"{self.success_prefix} 已将你的回复转达给 {target_name}！")
+        else:
+            yield event.plain_result(f"{self.error_prefix} 消息发送失败。")
+    
+    async def _do_quick_reply(self, event: AstrMessageEvent, n: int):
+        """快捷回复：直接从会话索引找到最近第 n 段传话的发送者"""
+        sender_id = str(event.get_sender_id())
+        thread = conversation_index.get(sender_id, n)
+        if not thread:
+            yield event.plain_result(f"{self.error_prefix} 没有第 {n} 段传话。发送「回复列表」查看最近的传话。")
+            return
+        
+        content = self._extract_all_content(event, skip_command=True)
+        if not content:
+            yield event.plain_result(f"{self.error_prefix} 请提供回复内容。\n用法: 回复 [序号] 消息内容")
+            return
+        
+        async for result in self._relay_reply(event, thread['from_user'], thread['from_name'], content):
+            yield result
+    
+    async def _do_quick_reply_list(self, event: AstrMessageEvent):
+        """列出最近收到的传话，序号用于 `回复 序号 内容`"""
+        threads = conversation_index.threads(str(event.get_sender_id()))
+        if not threads:
+            yield event.plain_result("📭 最近没有收到传话。")
+            return
+        
+        lines = ["💬 最近收到的传话："]
+        for i, thread in enumerate(threads, 1):
+            received_at = datetime.fromtimestamp(thread['time']).strftime('%m-%d %H:%M')
+            lines.append(f"{i}. {thread['from_name']}({thread['from_user']}) {received_at}")
+        lines.append("用法: 回复 消息内容（回复第1段）或 回复 序号 消息内容")
+        yield event.plain_result("\n".join(lines))
+    
     # ==================== 通告群聊 ====================
     
     async def _do_group_announce(self, event: AstrMessageEvent):
@@ -543,17 +1319,7 @@ class MessengerPlugin(Star):
         
         msg_id = await self._send_group_message(event, target_group, announce_msg)
         if msg_id:
-            message_records[msg_id] = {
-                "from_user": sender_id,
-                "to_user": sender_id,
-                "from_name": sender_name,
-                "to_name": sender_name,
-                "original_msg_id": msg_id,
-                "is_group_announce": True,
-                "target_group": target_group,
-                "target_group_name": group_name
-            }
-            _trim_records()
+            self._record_announce(msg_id, sender_id, sender_name, target_group, group_name)
             yield event.plain_result(f"{self.success_prefix} 已将通告发送到群「{group_name}」({target_group})！")
         else:
             yield event.plain_result(f"{self.error_prefix} 通告发送失败。")
@@ -607,25 +1373,11 @@ class MessengerPlugin(Star):
         sender_info = self._format_sender_info(sender_name, sender_id, group_name)
         tell_message = f"{self.msg_prefix} {sender_info} 对你说：\n{content}"
         
-        via_inbox = self.enable_inbox and self.inbox_id and self.owner_qq and str(target_qq) == str(self.owner_qq)
+        via_inbox = self._is_via_inbox(target_qq)
         
         msg_id = await self._send_to_user(event, target_qq, tell_message)
         if msg_id:
-            message_records[msg_id] = {
-                "from_user": sender_id,
-                "to_user": target_qq,
-                "from_name": sender_name,
-                "to_name": friend_name or target_qq,
-                "original_msg_id": msg_id,
-                "via_inbox": via_inbox
-            }
-            _trim_records()
-            user_last_received[target_qq] = {
-                "from_user": sender_id,
-                "from_name": sender_name,
-                "msg_id": msg_id,
-                "via_inbox": via_inbox
-            }
+            self._record_tell(msg_id, sender_id, sender_name, target_qq, friend_name or target_qq, via_inbox)
             yield event.plain_result(f"{self.success_prefix} 已将消息传达给 {friend_name or target_qq}！")
         else:
             yield event.plain_result(f"{self.error_prefix} 消息发送失败。")
@@ -641,6 +1393,11 @@ class MessengerPlugin(Star):
             yield event.plain_result(f"{self.error_prefix} 请提供要群发的消息内容。\n用法: 群发 消息内容")
             return
         
+        segment = self._extract_broadcast_segment(event.message_str)
+        if segment and not self.segments.exists(segment):
+            yield event.plain_result(f"{self.error_prefix} 分组「{segment}」不存在。发送「分组列表」查看可用分组。")
+            return
+        
         try:
             if event.get_platform_name() != "aiocqhttp":
                 yield event.plain_result(f"{self.error_prefix} 群发功能仅支持 QQ 平台。")
@@ -659,95 +1416,521 @@ class MessengerPlugin(Star):
             group_name = None if not current_group_id or self._is_inbox_group(current_group_id) else await self._get_group_name(event, current_group_id)
             sender_info = self._format_sender_info(sender_name, sender_id, group_name)
             
-            friend_list = await client.api.call_action('get_friend_list')
-            group_list = await client.api.call_action('get_group_list')
-            
-            if not friend_list and not group_list:
+            targets = await self._collect_broadcast_targets(client, sender_id, current_group_id, segment)
+            if targets is None:
                 yield event.plain_result(f"{self.error_prefix} 好友列表和群列表都为空。")
                 return
-            
-            friend_send_list = []
-            excluded_current = 0
-            inbox_excluded = 0
-            for friend in friend_list:
-                qq = str(friend.get('user_id', ''))
-                if not qq or qq in self.broadcast_blacklist:
-                    continue
-                if not current_group_id and qq == sender_id:
-                    excluded_current += 1
-                    continue
-                friend_send_list.append({'qq': qq, 'nickname': friend.get('nickname', qq)})
-            
-            group_send_list = []
-            for group in group_list:
-                gid = str(group.get('group_id', ''))
-                if not gid or gid in self.broadcast_blacklist:
-                    continue
-                if current_group_id and gid == current_group_id:
-                    excluded_current += 1
-                    continue
-                if self.enable_inbox and self.inbox_type == 'group' and self.inbox_id and gid == self.inbox_id:
-                    inbox_excluded += 1
-                    continue
-                group_send_list.append({'group_id': gid, 'group_name': group.get('group_name', gid)})
+            friend_send_list, group_send_list, stats = targets
             
             total = len(friend_send_list) + len(group_send_list)
             if total == 0:
                 yield event.plain_result(f"{self.error_prefix} 没有可发送的目标。")
                 return
             
-            blacklist_excluded = len(friend_list) + len(group_list) - total - excluded_current - inbox_excluded
-            inbox_info = f"\n📥 收件箱已排除: {inbox_excluded}" if inbox_excluded > 0 else ""
-            yield event.plain_result(f"📢 开始群发...\n👤 好友: {len(friend_send_list)}\n👥 群聊: {len(group_send_list)}\n🚫 黑名单: {blacklist_excluded}\n🔇 当前会话: {excluded_current}{inbox_info}")
-            
-            success_count = 0
-            fail_count = 0
+            inbox_info = f"\n📥 收件箱已排除: {stats['inbox_excluded']}" if stats['inbox_excluded'] > 0 else ""
+            segment_info = f"\n🎯 分组「{segment}」外已排除: {stats['segment_excluded']}" if segment else ""
+            broadcast_id = self.broadcast_log.create(sender_id)
+            # 生成器可能在开始提示处被关闭，此时 _send_broadcast 的 finally 不会执行，需要在这里结束群发记录
+            try:
+                yield event.plain_result(f"📢 开始群发...\n👤 好友: {len(friend_send_list)}\n👥 群聊: {len(group_send_list)}\n🚫 黑名单: {stats['blacklist_excluded']}\n🔇 当前会话: {stats['excluded_current']}{inbox_info}{segment_info}{self._format_recall_hint(broadcast_id)}")
+                
+                broadcast_msg = f"{self.msg_prefix} {sender_info} 对你说：\n{content}"
+                success_count, fail_count, stopped = await self._send_broadcast(event, client, sender_id, sender_name, broadcast_msg,
+                                                                                friend_send_list, group_send_list, broadcast_id)
+            finally:
+                self.broadcast_log.finish(broadcast_id)
             
-            broadcast_msg = f"{self.msg_prefix} {sender_info} 对你说：\n{content}"
+            status = "群发已中止（已执行群发撤回）" if stopped else "群发完成"
+            yield event.plain_result(f"{self.success_prefix} {status}！\n✅ 成功: {success_count}\n❌ 失败: {fail_count}")
             
-            for friend in friend_send_list:
+        except Exception as e:
+            logger.error(f"群发功能出错: {e}")
+            yield event.plain_result(f"{self.error_prefix} 群发失败: {str(e)}")
+    
+    # 群发过程中每发出多少条消息写一次群发记录
+    BROADCAST_SAVE_EVERY = 20
+    
+    async def _collect_broadcast_targets(self, client, sender_id: str, current_group_id: str, segment: str = None):
+        """
+        获取群发目标（排除黑名单、当前会话和收件箱，指定分组时只保留分组成员），列表均为空时返回 None
+        目标筛选通过 ID 集合运算完成，发送顺序保持好友/群列表原有顺序
+        """
+        friend_list = await client.api.call_action('get_friend_list')
+        group_list = await client.api.call_action('get_group_list')
+        
+        if not friend_list and not group_list:
+            return None
+        
+        friends = {str(f.get('user_id', '')): f.get('nickname', str(f.get('user_id', ''))) for f in friend_list or []}
+        groups = {str(g.get('group_id', '')): g.get('group_name', str(g.get('group_id', ''))) for g in group_list or []}
+        friends.pop('', None)
+        groups.pop('', None)
+        
+        friend_ids = friends.keys() - self.broadcast_blacklist
+        group_ids = groups.keys() - self.broadcast_blacklist
+        blacklist_excluded = len(friends) + len(groups) - len(friend_ids) - len(group_ids)
+        
+        segment_excluded = 0
+        if segment:
+            before = len(friend_ids) + len(group_ids)
+            if BUILTIN_SEGMENTS.get(segment) == 'friends':
+                group_ids = set()
+            elif BUILTIN_SEGMENTS.get(segment) == 'groups':
+                friend_ids = set()
+            else:
+                typed = self.segments.get(segment) or {'users': set(), 'groups': set()}
+                friend_ids &= typed['users']
+                group_ids &= typed['groups']
+            segment_excluded = before - len(friend_ids) - len(group_ids)
+        
+        excluded_current = 0
+        if not current_group_id and sender_id in friend_ids:
+            friend_ids.discard(sender_id)
+            excluded_current += 1
+        if current_group_id and current_group_id in group_ids:
+            group_ids.discard(current_group_id)
+            excluded_current += 1
+        
+        inbox_excluded = 0
+        if self.enable_inbox and self.inbox_type == 'group' and self.inbox_id and self.inbox_id in group_ids:
+            group_ids.discard(self.inbox_id)
+            inbox_excluded += 1
+        
+        friend_send_list = [{'qq': qq, 'nickname': nickname} for qq, nickname in friends.items() if qq in friend_ids]
+        group_send_list = [{'group_id': gid, 'group_name': name} for gid, name in groups.items() if gid in group_ids]
+        stats = {
+            "excluded_current": excluded_current,
+            "inbox_excluded": inbox_excluded,
+            "blacklist_excluded": blacklist_excluded,
+            "segment_excluded": segment_excluded
+        }
+        return friend_send_list, group_send_list, stats
+    
+    async def _send_broadcast(self, event: Optional[AstrMessageEvent], client, sender_id: str, sender_name: str, broadcast_msg: str,
+                              friend_send_list: list, group_send_list: list, broadcast_id: str) -> Tuple[int, int, bool]:
+        """
+        逐个发送群发消息并记录回复链，发出的消息同步追加到群发记录（每 BROADCAST_SAVE_EVERY 条写一次文件），
+        被群发撤回中止时停止后续发送，返回 (成功数, 失败数, 是否被中止)
+        """
+        success_count = 0
+        fail_count = 0
+        stopped = False
+        unsaved = 0
+        
+        targets = [(friend, False) for friend in friend_send_list] + [(group, True) for group in group_send_list]
+        try:
+            for target, is_group in targets:
+                if self.broadcast_log.is_stopped(broadcast_id):
+                    stopped = True
+                    break
                 try:
-                    msg_id = await self._send_to_user(event, friend['qq'], broadcast_msg)
-                    if msg_id:
-                        message_records[msg_id] = {
-                            "from_user": sender_id,
-                            "to_user": friend['qq'],
-                            "from_name": sender_name,
-                            "to_name": friend['nickname'],
-                            "original_msg_id": msg_id
-                        }
+                    if is_group:
+                        result = await client.api.call_action('send_group_msg', group_id=int(target['group_id']), message=broadcast_msg)
+                        msg_id = str(result.get('message_id', '')) if result else None
+                        if msg_id:
+                            message_records[msg_id] = {
+                                "from_user": sender_id,
+                                "to_user": target['group_id'],
+                                "from_name": sender_name,
+                                "to_name": target['group_name'],
+                                "original_msg_id": msg_id,
+                                "is_group": True
+                            }
+                            self.broadcast_log.record(broadcast_id, [target['group_id'], msg_id, 1])
+                            unsaved += 1
+                    else:
+                        msg_id = await self._send_to_user(event, target['qq'], broadcast_msg, client=client)
+                        if msg_id:
+                            message_records[msg_id] = {
+                                "from_user": sender_id,
+                                "to_user": target['qq'],
+                                "from_name": sender_name,
+                                "to_name": target['nickname'],
+                                "original_msg_id": msg_id
+                            }
+                            self.broadcast_log.record(broadcast_id, [target['qq'], msg_id, 0])
+                            unsaved += 1
                     success_count += 1
                 except Exception:
                     fail_count += 1
+                if unsaved >= self.BROADCAST_SAVE_EVERY:
+                    await self.broadcast_log.save()
+                    unsaved = 0
                 if self.broadcast_delay > 0:
                     await asyncio.sleep(self.broadcast_delay)
-            
-            for group in group_send_list:
+        finally:
+            _trim_records()
+            self.broadcast_log.finish(broadcast_id)
+            await self.broadcast_log.save()
+        
+        return success_count, fail_count, stopped
+    
+    def _format_recall_hint(self, broadcast_id: str) -> str:
+        """群发开始/结束时的撤回提示"""
+        return f"\n🆔 群发ID: {broadcast_id}（发送「群发撤回 {broadcast_id}」可随时撤回）"
+    
+    async def _do_broadcast_recall(self, event: AstrMessageEvent, broadcast_id: str):
+        """撤回一次群发的所有消息：按并发上限同时撤回，并汇报进度和结果"""
+        client = self._get_client(event)
+        if client is None:
+            yield event.plain_result(f"{self.error_prefix} 群发撤回功能仅支持 QQ 平台。")
+            return
+        
+        if not self.broadcast_log.get(broadcast_id):
+            yield event.plain_result(f"{self.error_prefix} 未找到群发记录 #{broadcast_id}（仅保留最近 {MAX_BROADCAST_HISTORY} 次群发）。")
+            return
+        
+        # 群发仍在进行时先停止后续发送，等当前这条发完再撤回，避免漏掉
+        if self.broadcast_log.is_active(broadcast_id):
+            yield event.plain_result(f"⏸️ 群发 #{broadcast_id} 仍在发送中，正在停止后续发送...")
+            await self.broadcast_log.stop(broadcast_id)
+        
+        entry = self.broadcast_log.get(broadcast_id)
+        sent = list(entry['sent']) if entry else []
+        total = len(sent)
+        if total == 0:
+            yield event.plain_result(f"{self.success_prefix} 群发 #{broadcast_id} 已停止，没有需要撤回的消息。")
+            return
+        yield event.plain_result(f"🗑️ 开始撤回群发 #{broadcast_id}，共 {total} 条消息...")
+        
+        semaphore = asyncio.Semaphore(self.recall_concurrency)
+        
+        async def recall(item: list) -> Tuple[list, bool]:
+            async with semaphore:
                 try:
-                    result = await client.api.call_action('send_group_msg', group_id=int(group['group_id']), message=broadcast_msg)
-                    msg_id = str(result.get('message_id', '')) if result else None
-                    if msg_id:
-                        message_records[msg_id] = {
-                            "from_user": sender_id,
-                            "to_user": group['group_id'],
-                            "from_name": sender_name,
-                            "to_name": group['group_name'],
-                            "original_msg_id": msg_id,
-                            "is_group": True
-                        }
-                    success_count += 1
-                except Exception:
-                    fail_count += 1
+                    await client.api.call_action('delete_msg', message_id=int(item[1]))
+                    ok = True
+                except Exception as e:
+                    logger.warning(f"[Messenger] 撤回消息 {item[1]}（目标 {item[0]}）失败: {e}")
+                    ok = False
                 if self.broadcast_delay > 0:
                     await asyncio.sleep(self.broadcast_delay)
-            
-            yield event.plain_result(f"{self.success_prefix} 群发完成！\n✅ 成功: {success_count}\n❌ 失败: {fail_count}")
-            
-        except Exception as e:
-            logger.error(f"群发功能出错: {e}")
-            yield event.plain_result(f"{self.error_prefix} 群发失败: {str(e)}")
+            return item, ok
+        
+        failed = []
+        recalled_ids = set()
+        done = 0
+        # 消息较多时每完成约四分之一汇报一次进度
+        progress_step = max(1, total // 4) if total >= 20 else 0
+        for future in asyncio.as_completed([recall(item) for item in sent]):
+            item, ok = await future
+            done += 1
+            if ok:
+                recalled_ids.add(item[1])
+                message_records.pop(item[1], None)
+            else:
+                failed.append(item)
+            if progress_step and done % progress_step == 0 and done < total:
+                yield event.plain_result(f"⏳ 撤回进度: {done}/{total}")
+        
+        await self.broadcast_log.remove_recalled(broadcast_id, recalled_ids)
+        logger.info(f"[Messenger] 群发撤回 #{broadcast_id}: 成功 {total - len(failed)}, 失败 {len(failed)}")
+        
+        result = f"{self.success_prefix} 群发撤回完成！\n✅ 成功: {total - len(failed)}\n❌ 失败: {len(failed)}"
+        if failed:
+            failed_desc = "、".join(f"{'群' if item[2] else ''}{item[0]}" for item in failed[:10])
+            more = f" 等 {len(failed)} 个" if len(failed) > 10 else ""
+            result += f"\n失败目标: {failed_desc}{more}\n（超过撤回时限或权限不足的消息无法撤回，可再次发送命令重试）"
+        yield event.plain_result(result)
+    
+    # ==================== 群发分组 ====================
+    
+    SEGMENT_VIEW_LIMIT = 50
+    
+    def _extract_segment_members(self, event: AstrMessageEvent, args: str) -> List[Tuple[Optional[str], str]]:
+        """
+        从分组命令中提取成员，返回 (类型, ID) 列表，类型为 users/groups，未标明时为 None
+        支持 u:QQ号 / 好友:QQ号、g:群号 / 群:群号，以及 @ 的用户
+        """
+        prefixes = {'u': 'users', '好友': 'users', 'g': 'groups', '群': 'groups'}
+        members = [(prefixes[prefix.lower()] if prefix else None, member_id)
+                   for prefix, member_id in re.findall(r'(?<![\w:：])(?:(u|g|好友|群)[:：])?(\d{5,11})(?!\d)', args, re.IGNORECASE)]
+        bot_id = self._get_bot_id(event)
+        for comp in event.message_obj.message:
+            if isinstance(comp, At):
+                qq = str(comp.qq) if hasattr(comp, 'qq') and comp.qq else None
+                if qq and qq != bot_id and ('users', qq) not in members:
+                    members.append(('users', qq))
+        return members
+    
+    async def _resolve_segment_members(self, event: AstrMessageEvent, members: List[Tuple[Optional[str], str]]) -> Tuple[Set[str], Set[str], List[str]]:
+        """按好友/群列表确定未标明类型的成员，返回 (QQ号集合, 群号集合, 无法确定类型的 ID)"""
+        users = {member_id for kind, member_id in members if kind == 'users'}
+        groups = {member_id for kind, member_id in members if kind == 'groups'}
+        untyped = [member_id for kind, member_id in members if kind is None]
+        if not untyped:
+            return users, groups, []
+        
+        friend_ids: Set[str] = set()
+        group_ids: Set[str] = set()
+        client = self._get_client(event)
+        if client:
+            try:
+                friend_ids = {str(f.get('user_id', '')) for f in await client.api.call_action('get_friend_list') or []}
+                group_ids = {str(g.get('group_id', '')) for g in await client.api.call_action('get_group_list') or []}
+            except Exception as e:
+                logger.error(f"[Messenger] 获取好友/群列表失败: {e}")
+        
+        unresolved = []
+        for member_id in untyped:
+            is_friend, is_group = member_id in friend_ids, member_id in group_ids
+            if is_friend and not is_group:
+                users.add(member_id)
+            elif is_group and not is_friend:
+                groups.add(member_id)
+            else:
+                unresolved.append(member_id)
+        return users, groups, unresolved
+    
+    async def _do_segment_command(self, event: AstrMessageEvent, action: str, args: str):
+        """管理群发分组（仅管理员）"""
+        if action == '列表':
+            lines = ["🎯 群发分组：", "• 好友（内置）- 仅所有好友", "• 群聊（内置）- 仅所有群聊"]
+            for name, typed in sorted(self.segments.members.items()):
+                lines.append(f"• {name} - {len(typed['users'])} 个好友，{len(typed['groups'])} 个群")
+            lines.append("用法: 群发 @分组名 消息内容")
+            yield event.plain_result("\n".join(lines))
+            return
+        
+        usage = f"分组{action} 分组名{' QQ号/群号...（可用 u:QQ号、g:群号 标明类型）' if action in ('添加', '移除') else ''}"
+        name = args.split(maxsplit=1)[0] if args else ""
+        if not name:
+            yield event.plain_result(f"{self.error_prefix} 请指定分组名。\n用法: {usage}")
+            return
+        
+        if action == '查看':
+            if name in BUILTIN_SEGMENTS:
+                scope = "所有好友" if BUILTIN_SEGMENTS[name] == 'friends' else "所有群聊"
+                yield event.plain_result(f"🎯 「{name}」是内置分组：群发给{scope}，成员随好友/群列表自动变化。")
+                return
+            typed = self.segments.get(name)
+            if not typed:
+                yield event.plain_result(f"{self.error_prefix} 分组「{name}」不存在。")
+                return
+            lines = [f"🎯 分组「{name}」共 {self.segments.size(name)} 个成员："]
+            for label, kind in (("👤 好友", 'users'), ("👥 群聊", 'groups')):
+                ids = sorted(typed[kind])
+                if ids:
+                    more = f" ……还有 {len(ids) - self.SEGMENT_VIEW_LIMIT} 个" if len(ids) > self.SEGMENT_VIEW_LIMIT else ""
+                    lines.append(f"{label}: {', '.join(ids[:self.SEGMENT_VIEW_LIMIT])}{more}")
+            yield event.plain_result("\n".join(lines))
+            return
+        
+        if name in BUILTIN_SEGMENTS:
+            yield event.plain_result(f"{self.error_prefix} 「{name}」是内置分组，不能修改。")
+            return
+        
+        if action == '删除':
+            if self.segments.delete(name):
+                yield event.plain_result(f"{self.success_prefix} 已删除分组「{name}」。")
+            else:
+                yield event.plain_result(f"{self.error_prefix} 分组「{name}」不存在。")
+            return
+        
+        if re.fullmatch(r'\d+', name) or not re.fullmatch(r'[^\s@#(（:：]{1,20}', name):
+            yield event.plain_result(f"{self.error_prefix} 分组名需为 1-20 个字符，不能是纯数字，也不能包含空格、@、#、冒号、括号。")
+            return
+        members = self._extract_segment_members(event, args[len(name):])
+        if not members:
+            yield event.plain_result(f"{self.error_prefix} 请提供 QQ号 或 群号。\n用法: {usage}")
+            return
+        
+        if action == '添加':
+            users, groups, unresolved = await self._resolve_segment_members(event, members)
+            added = self.segments.add_members(name, users, groups) if users or groups else 0
+            result = f"{self.success_prefix} 已向分组「{name}」添加 {added} 个成员，当前共 {self.segments.size(name)} 个。"
+            if unresolved:
+                result += (f"\n⚠️ 无法确定以下号码是好友还是群（不在列表中或同时存在），未添加：{', '.join(unresolved)}"
+                           f"\n请用 u:QQ号 或 g:群号 标明类型")
+            yield event.plain_result(result)
+        else:
+            if self.segments.get(name) is None:
+                yield event.plain_result(f"{self.error_prefix} 分组「{name}」不存在。")
+                return
+            # 未标明类型的号码同时从好友和群中移除
+            users = {member_id for kind, member_id in members if kind != 'groups'}
+            groups = {member_id for kind, member_id in members if kind != 'users'}
+            removed = self.segments.remove_members(name, users, groups)
+            yield event.plain_result(f"{self.success_prefix} 已从分组「{name}」移除 {removed} 个成员，剩余 {self.segments.size(name)} 个。")
+    
+    # ==================== 定时任务 ====================
+    
+    SCHEDULE_KIND_NAMES = {'tell': '传话', 'announce': '通告群聊', 'broadcast': '群发'}
+    SCHEDULE_USAGES = {
+        'tell': '定时传话 时间 @某人 消息内容',
+        'announce': '定时通告群聊 时间 群号 消息内容',
+        'broadcast': '定时群发 时间 [@分组名] 消息内容'
+    }
+    SCHEDULE_LIST_LIMIT = 20
+    
+    def _describe_task_target(self, task: dict) -> str:
+        """定时任务的发送目标描述"""
+        if task['kind'] == 'tell':
+            return task['target_name']
+        if task['kind'] == 'announce':
+            return f"群「{task['target_name']}」({task['target']})"
+        if task.get('segment'):
+            return f"分组「{task['segment']}」"
+        return "所有好友和群聊"
+    
+    async def _do_schedule(self, event: AstrMessageEvent, kind: str):
+        """创建定时任务（传话/通告群聊/群发）"""
+        message_str = event.message_str
+        sender_id = str(event.get_sender_id())
+        sender_name = event.get_sender_name()
+        usage = self.SCHEDULE_USAGES[kind]
+        
+        time_match = re.search(rf'定时(?:传话|转发|转告|通告群聊|群聊通告|群发|一键群发)\s*({SCHEDULE_TIME_PATTERN})', message_str)
+        fire_dt = _parse_schedule_time(time_match.group(1)) if time_match else None
+        if not fire_dt or fire_dt <= datetime.now():
+            yield event.plain_result(f"{self.error_prefix} 请指定正确的发送时间。\n用法: {usage}\n时间格式: 30m、1h30m、2小时、20:30、10-20 08:00")
+            return
+        if fire_dt - datetime.now() > MAX_SCHEDULE_AHEAD:
+            yield event.plain_result(f"{self.error_prefix} 定时任务最多只能预约 {MAX_SCHEDULE_AHEAD.days} 天以内。")
+            return
+        if not self._is_admin(sender_id) and self.scheduler.count_by_creator(sender_id) >= MAX_PENDING_PER_USER:
+            yield event.plain_result(f"{self.error_prefix} 你的待发送定时任务已达上限（{MAX_PENDING_PER_USER} 个），请先取消部分任务。")
+            return
+        
+        group_id = event.message_obj.group_id
+        source_group_name = None if not group_id or self._is_inbox_group(group_id) else await self._get_group_name(event, str(group_id))
+        sender_info = self._format_sender_info(sender_name, sender_id, source_group_name)
+        
+        task = {
+            "kind": kind,
+            "fire_at": fire_dt.timestamp(),
+            "creator": sender_id,
+            "creator_name": sender_name,
+            "self_id": self._get_bot_id(event)
+        }
+        
+        if kind == 'tell':
+            target_qq = self._extract_target_qq(event, message_str)
+            if not target_qq:
+                yield event.plain_result(f"{self.error_prefix} 请指定传话目标。\n用法: {usage}")
+                return
+            is_friend, friend_name = await self._check_friend(event, target_qq)
+            if not is_friend:
+                yield event.plain_result(f"{self.error_prefix} {target_qq} 不在我的好友列表中。")
+                return
+            content = self._extract_all_content(event, skip_command=True) or "[空消息]"
+            task.update(target=target_qq, target_name=friend_name or target_qq,
+                        message=f"{self.msg_prefix} {sender_info} 对你说：\n{content}")
+        elif kind == 'announce':
+            target_group = self._extract_target_group(message_str)
+            if not target_group:
+                yield event.plain_result(f"{self.error_prefix} 请指定目标群号。\n用法: {usage}")
+                return
+            in_group, group_name = await self._check_group(event, target_group)
+            if not in_group:
+                yield event.plain_result(f"{self.error_prefix} Bot 不在群 {target_group} 中，无法发送通告。")
+                return
+            content = self._extract_all_content(event, skip_command=True)
+            if not content:
+                yield event.plain_result(f"{self.error_prefix} 请提供通告内容。\n用法: {usage}")
+                return
+            task.update(target=target_group, target_name=group_name,
+                        message=f"{self.msg_prefix} {sender_info} 通告：\n{content}")
+        else:
+            if self._get_client(event) is None:
+                yield event.plain_result(f"{self.error_prefix} 群发功能仅支持 QQ 平台。")
+                return
+            segment = self._extract_broadcast_segment(message_str)
+            if segment and not self.segments.exists(segment):
+                yield event.plain_result(f"{self.error_prefix} 分组「{segment}」不存在。发送「分组列表」查看可用分组。")
+                return
+            content = self._extract_all_content(event, skip_command=True)
+            if not content:
+                yield event.plain_result(f"{self.error_prefix} 请提供要群发的消息内容。\n用法: {usage}")
+                return
+            task.update(current_group_id=str(group_id) if group_id else "", segment=segment,
+                        message=f"{self.msg_prefix} {sender_info} 对你说：\n{content}")
+        
+        task = await self.scheduler.add(task)
+        logger.info(f"[Messenger] 创建定时{self.SCHEDULE_KIND_NAMES[kind]} #{task['id']}: {sender_name} -> "
+                    f"{self._describe_task_target(task)} @ {fire_dt:%Y-%m-%d %H:%M}")
+        yield event.plain_result(f"{self.success_prefix} 已创建定时任务 #{task['id']}，将于 {fire_dt:%Y-%m-%d %H:%M} "
+                                 f"{self.SCHEDULE_KIND_NAMES[kind]}给 {self._describe_task_target(task)}。\n取消请发送: 取消定时 {task['id']}")
+    
+    async def _do_schedule_list(self, event: AstrMessageEvent):
+        """列出待发送的定时任务（管理员可查看所有人的任务）"""
+        sender_id = str(event.get_sender_id())
+        tasks = self.scheduler.list_tasks(None if self._is_admin(sender_id) else sender_id)
+        if not tasks:
+            yield event.plain_result("📭 暂无待发送的定时任务。")
+            return
+        
+        lines = [f"⏰ 待发送的定时任务（共 {len(tasks)} 个）："]
+        for task in tasks[:self.SCHEDULE_LIST_LIMIT]:
+            fire_time = datetime.fromtimestamp(task['fire_at']).strftime('%m-%d %H:%M')
+            preview = task['message'].split('\n', 1)[-1][:20]
+            lines.append(f"#{task['id']} {fire_time} {self.SCHEDULE_KIND_NAMES[task['kind']]} → {self._describe_task_target(task)}：{preview}")
+        if len(tasks) > self.SCHEDULE_LIST_LIMIT:
+            lines.append(f"……还有 {len(tasks) - self.SCHEDULE_LIST_LIMIT} 个")
+        lines.append("取消请发送: 取消定时 任务ID")
+        yield event.plain_result("\n".join(lines))
+    
+    async def _do_schedule_cancel(self, event: AstrMessageEvent, task_id: str):
+        """取消定时任务（只能取消自己的，管理员可取消任意任务）"""
+        sender_id = str(event.get_sender_id())
+        task = self.scheduler.tasks.get(task_id)
+        if not task or (task['creator'] != sender_id and not self._is_admin(sender_id)):
+            yield event.plain_result(f"{self.error_prefix} 未找到定时任务 #{task_id}。")
+            return
+        await self.scheduler.cancel(task_id)
+        yield event.plain_result(f"{self.success_prefix} 已取消定时任务 #{task_id}。")
+    
+    async def _fire_scheduled(self, task: dict):
+        """定时任务触发：复用现有发送路径并记录回复链，失败或群发完成时通知创建者"""
+        kind = task['kind']
+        kind_name = self.SCHEDULE_KIND_NAMES[kind]
+        logger.info(f"[Messenger] 执行定时{kind_name} #{task['id']}: {task['creator_name']} -> {self._describe_task_target(task)}")
+        
+        # 使用创建任务时的 bot 账号发送
+        client = await self._resolve_client(task.get('self_id'))
+        if client is None:
+            logger.error(f"[Messenger] 定时{kind_name} #{task['id']} 未发送：找不到 bot {task.get('self_id') or ''} 的客户端")
+            return
+        
+        if kind == 'tell':
+            msg_id = await self._send_to_user(None, task['target'], task['message'], client=client)
+            if msg_id:
+                self._record_tell(msg_id, task['creator'], task['creator_name'], task['target'], task['target_name'],
+                                  self._is_via_inbox(task['target']))
+                return
+            notice = f"{self.error_prefix} 定时传话 #{task['id']} 发送给 {task['target_name']} 失败。"
+        elif kind == 'announce':
+            msg_id = await self._send_group_message(None, task['target'], task['message'], client=client)
+            if msg_id:
+                self._record_announce(msg_id, task['creator'], task['creator_name'], task['target'], task['target_name'])
+                return
+            notice = f"{self.error_prefix} 定时通告 #{task['id']} 发送到群「{task['target_name']}」失败。"
+        else:
+            segment = task.get('segment')
+            if segment and not self.segments.exists(segment):
+                await self._send_to_user(None, task['creator'], f"{self.error_prefix} 定时群发 #{task['id']} 的分组「{segment}」已不存在，未发送。", client=client)
+                return
+            targets = await self._collect_broadcast_targets(client, task['creator'], task['current_group_id'], segment)
+            if not targets or not (targets[0] or targets[1]):
+                notice = f"{self.error_prefix} 定时群发 #{task['id']} 没有可发送的目标。"
+            else:
+                broadcast_id = self.broadcast_log.create(task['creator'])
+                try:
+                    # 开始前先告知群发ID，发现错误时可以在发送途中撤回
+                    await self._send_to_user(None, task['creator'], f"📢 定时群发 #{task['id']} 开始发送...\n👤 好友: {len(targets[0])}\n"
+                                                                    f"👥 群聊: {len(targets[1])}{self._format_recall_hint(broadcast_id)}", client=client)
+                    success_count, fail_count, stopped = await self._send_broadcast(None, client, task['creator'], task['creator_name'],
+                                                                                    task['message'], targets[0], targets[1], broadcast_id)
+                finally:
+                    self.broadcast_log.finish(broadcast_id)
+                status = "已中止" if stopped else "完成"
+                notice = f"{self.success_prefix} 定时群发 #{task['id']} {status}！\n✅ 成功: {success_count}\n❌ 失败: {fail_count}"
+        
+        await self._send_to_user(None, task['creator'], notice, client=client)
     
     async def terminate(self):
         """插件卸载时清理"""
+        await self.scheduler.stop()
         message_records.clear()
-        user_last_received.clear()
+        conversation_index.clear()
+        seen_events.clear()